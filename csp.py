@@ -1,9 +1,22 @@
 from typing import Any
-from queue import Queue
+from collections import deque
+from itertools import combinations
 from time import time
 
 
 class CSP:
+    __slots__ = (
+        'variables',
+        'var_index',
+        '_values',
+        '_bit',
+        '_domains',
+        'total_backtrack_calls',
+        'total_failed_backtracks',
+        'has_constraint',
+        'neighbors',
+    )
+
     def __init__(
         self,
         variables: list[str],
@@ -22,99 +35,98 @@ class CSP:
             Pairs of variables that must not be assigned the same value
         """
         self.variables = variables
-        self.domains = domains
+
+        # Variables are referred to internally by their index in self.variables, so domains and
+        # neighbors are lists indexed by variable and constraints are keyed by pairs of indices.
+        self.var_index: dict[str, int] = {variable: i for i, variable in enumerate(variables)}
+        domain_sets = [domains[variable] for variable in variables]
+        edges = [(self.var_index[variable1], self.var_index[variable2]) for variable1, variable2 in edges]
+
+        # Domains as integer bitmasks. Every value occurring in some domain is given its own bit,
+        # self._values[k] being the value of bit k, and a domain is the OR of the bits of its values.
+        self._values: list[Any] = list(dict.fromkeys(value for domain in domain_sets for value in domain))
+        self._bit: dict[Any, int] = {value: 1 << k for k, value in enumerate(self._values)}
+        self._domains: list[int] = [self._to_mask(domain) for domain in domain_sets]
 
         self.total_backtrack_calls = 0
         self.total_failed_backtracks = 0
 
-        # Binary constraints as a dictionary mapping variable pairs to a set of value pairs.
+        # Binary constraints as the set of arcs (variable1, variable2) whose variables must not be
+        # assigned the same value, i.e. all of the edges, stored in both directions.
+        # As they are all of this one kind, no sets of allowed value pairs are built for them.
         #
         # To check if variable1=value1, variable2=value2 is in violation of a binary constraint:
-        # if (
-        #     (variable1, variable2) in self.binary_constraints and
-        #     (value1, value2) not in self.binary_constraints[(variable1, variable2)]
-        # ) or (
-        #     (variable2, variable1) in self.binary_constraints and
-        #     (value1, value2) not in self.binary_constraints[(variable2, variable1)]
-        # ):
+        # if self.has_constraint[variable1 * len(self.variables) + variable2] and value1 == value2:
         #     Violates a binary constraint
-        self.binary_constraints: dict[tuple[str, str], set] = {}
+        #
+        # The arcs are stored as a dense adjacency matrix, flattened so that the arc
+        # (variable1, variable2) is encoded as the single int variable1 * len(self.variables) + variable2.
+        n = len(variables)
+        self.has_constraint = bytearray(n * n)
+        for variable1, variable2 in edges:
+            self.has_constraint[variable1 * n + variable2] = 1
+            self.has_constraint[variable2 * n + variable1] = 1
+
+        # Neighbors of each variable, i.e. the variables it shares a binary constraint with.
+        # A dict is used as an insertion-ordered set so that duplicate edges are dropped.
+        neighbors: list[dict[int, None]] = [{} for _ in variables]
         for variable1, variable2 in edges:
-            self.binary_constraints[(variable1, variable2)] = set()
-            for value1 in self.domains[variable1]:
-                for value2 in self.domains[variable2]:
-                    if value1 != value2:
-                        self.binary_constraints[(variable1, variable2)].add((value1, value2))
-                        self.binary_constraints[(variable1, variable2)].add((value2, value1))
-
-    def ac_3(self) -> bool:
+            neighbors[variable1][variable2] = None
+            neighbors[variable2][variable1] = None
+        self.neighbors: list[tuple[int, ...]] = [tuple(adjacent) for adjacent in neighbors]
+
+    @property
+    def domains(self) -> dict[str, frozenset]:
+        """A read-only snapshot of the current domains of the variables.
+
+        The domains are stored internally as bitmasks and decoded on every access, so read this
+        once rather than in a loop. Changing the returned dict does not change the CSP, and the
+        domains are frozensets so that attempts to modify them fail loudly.
+        """
+        return {variable: frozenset(self._to_values(mask)) for variable, mask in zip(self.variables, self._domains)}
+
+    def _to_mask(self, values) -> int:
+        """Returns the bitmask of the given values."""
+        mask = 0
+        for value in values:
+            mask |= self._bit[value]
+        return mask
+
+    def _to_values(self, mask: int) -> list[Any]:
+        """Returns the values whose bits are set in the given bitmask."""
+        values = []
+        while mask:
+            bit = mask & -mask
+            values.append(self._values[bit.bit_length() - 1])
+            mask ^= bit
+        return values
+
+    def ac_3(self, trail: list[tuple[int, int]] | None = None) -> bool:
         """Performs AC-3 on the CSP.
         Meant to be run prior to calling backtracking_search() to reduce the search for some problems.
         
-        Returns
-        -------
-        bool
-            False if a domain becomes empty, otherwise True
-        """
-        # Initialize queue with all arcs
-        queue = Queue()
-        for (var1, var2) in self.binary_constraints:
-            queue.put((var1, var2))
-        
-        while not queue.empty():
-            xi, xj = queue.get()
-            if self._revise(xi, xj):
-                if len(self.domains[xi]) == 0:
-                    return False
-                # Add all arcs (xk, xi) where xk is a neighbor of xi (except xj)
-                for (var1, var2) in self.binary_constraints:
-                    if var2 == xi and var1 != xj:
-                        queue.put((var1, xi))
-                    elif var1 == xi and var2 != xj:
-                        queue.put((var2, xi))
-        return True
-    
-    def _revise(self, xi: str, xj: str) -> bool:
-        """Revise the domain of xi to make it arc-consistent with xj.
-        
         Parameters
         ----------
-        xi : str
-            The variable whose domain we're revising
-        xj : str
-            The variable we're checking consistency against
-            
+        trail : list[tuple[int, int]] | None
+            If given, a (variable, previous domain) entry is appended for every domain that is revised
+        
         Returns
         -------
         bool
-            True if the domain of xi was revised (values were removed)
+            False if a domain becomes empty, otherwise True
         """
-        revised = False
-        values_to_remove = []
-        
-        for value_i in self.domains[xi]:
-            # Check if there exists a value in xj's domain that satisfies the constraint
-            consistent = False
-            for value_j in self.domains[xj]:
-                # Check if (value_i, value_j) satisfies the constraint
-                if (xi, xj) in self.binary_constraints:
-                    if (value_i, value_j) in self.binary_constraints[(xi, xj)]:
-                        consistent = True
-                        break
-                elif (xj, xi) in self.binary_constraints:
-                    if (value_j, value_i) in self.binary_constraints[(xj, xi)]:
-                        consistent = True
-                        break
-            
-            if not consistent:
-                values_to_remove.append(value_i)
-                revised = True
-        
-        # Remove inconsistent values
-        for value in values_to_remove:
-            self.domains[xi].remove(value)
-            
-        return revised
+        # Initialize queue with the arcs (xi, xj) where xj has at most one value left, since a value
+        # of xi can only lose its support in xj then. The other arcs are queued once xj is revised.
+        # in_queue mirrors the contents of the queue so that each arc is queued at most once.
+        n = len(self.variables)
+        queue = deque()
+        in_queue = bytearray(n * n)
+        for xj, domain_j in enumerate(self._domains):
+            if not domain_j & (domain_j - 1):
+                for xi in self.neighbors[xj]:
+                    in_queue[xi * n + xj] = 1
+                    queue.append(xi * n + xj)
+        return _ac3_core(self._domains, self.neighbors, queue, in_queue, trail)
 
 
 
@@ -127,22 +139,45 @@ class CSP:
             A solution if any exists, otherwise None
         """
         start_time = time()
-        def backtrack(assignment: dict[str, Any]):
+        # Number of unassigned neighbors of each variable, kept up to date as variables are assigned
+        unassigned_degree = [len(adjacent) for adjacent in self.neighbors]
+        # Bitmask of the values held by the assigned neighbors of each variable. Unlike the domains,
+        # which only shrink through inference, this always reflects the current assignment.
+        blocked = [0] * len(self.variables)
+
+        def backtrack(assignment: dict[int, Any], unassigned: set[int]):
             self.total_backtrack_calls += 1
             # if assignment is complete then return assignment
-            if len(assignment) == len(self.variables):
+            if not unassigned:
                 return assignment
             
             # var ← SELECT-UNASSIGNED-VARIABLE(csp, assignment)
-            unassigned_vars = [v for v in self.variables if v not in assignment]
-            var = unassigned_vars[0]  # Simple selection strategy
+            # Minimum remaining values: the variable with the fewest legal values, i.e. values left in
+            # its domain that no assigned neighbor holds, ties broken by the degree heuristic:
+            # the most constraints with unassigned variables
+            var = min(
+                unassigned,
+                key=lambda v: ((self._domains[v] & ~blocked[v]).bit_count(), -unassigned_degree[v]),
+            )
+            unassigned.remove(var)
+            for neighbor in self.neighbors[var]:
+                unassigned_degree[neighbor] -= 1
             
             # for each value in ORDER-DOMAIN-VALUES(csp, var, assignment) do
-            for value in list(self.domains[var]):
+            # The domain is iterated as a copy of its bitmask, taking the lowest set bit each time.
+            # Inferences change it while values are tried, but it is restored before the next one.
+            remaining = self._domains[var]
+            while remaining:
+                bit = remaining & -remaining
+                remaining ^= bit
+                value = self._values[bit.bit_length() - 1]
                 # if value is consistent with assignment then
                 if self._is_consistent(var, value, assignment):
                     # add {var = value} to assignment
                     assignment[var] = value
+                    newly_blocked = [neighbor for neighbor in self.neighbors[var] if not blocked[neighbor] & bit]
+                    for neighbor in newly_blocked:
+                        blocked[neighbor] |= bit
                     
                     # inferences ← INFERENCE(csp, var, assignment)
                     inferences = self._make_inference(var, value, assignment)
@@ -151,7 +186,7 @@ class CSP:
                     if inferences is not None:
                         # add inferences to csp (already applied in _make_inference)
                         # result ← BACKTRACK(csp, assignment)
-                        result = backtrack(assignment)
+                        result = backtrack(assignment, unassigned)
                         # if result ≠ failure then return result
                         if result is not None:
                             return result
@@ -160,85 +195,107 @@ class CSP:
                     if inferences is not None:
                         self._restore_inferences(inferences)
                     # remove {var = value} from assignment
+                    for neighbor in newly_blocked:
+                        blocked[neighbor] ^= bit
                     del assignment[var]
             
+            unassigned.add(var)
+            for neighbor in self.neighbors[var]:
+                unassigned_degree[neighbor] += 1
             self.total_failed_backtracks += 1
             # return failure
             return None
-        result = backtrack({})
+        result = backtrack({}, set(range(len(self.variables))))
         end_time = time()
         print(f"Backtracking search took {end_time - start_time:.4f} seconds")
-        return result
+        if result is None:
+            return None
+        return {variable: result[var] for var, variable in enumerate(self.variables)}
 
 
 
-    def _make_inference(self, var: str, value: Any, assignment: dict[str, Any]) -> dict[str, set] | None:
+    def _make_inference(self, var: int, value: Any, assignment: dict[int, Any]) -> list[tuple[int, int]] | None:
         """Make inferences after assigning value to var.
         
-        Toggle between AC-3 inference and no inference by commenting/uncommenting sections.
+        Toggle between AC-3 inference, forward checking and no inference by commenting/uncommenting sections.
         
         Parameters
         ----------
-        var : str
-            The variable that was just assigned
+        var : int
+            The index of the variable that was just assigned
         value : Any
             The value assigned to var
-        assignment : dict[str, Any]
+        assignment : dict[int, Any]
             Current assignment
             
         Returns
         -------
-        dict[str, set] | None
-            Dictionary of removed values for each variable, or None if failure
+        list[tuple[int, int]] | None
+            Trail of (variable, previous domain) entries for the domains that were changed,
+            or None if failure
         """
         
         # # OPTION 1: AC-3 Inference
-        # # Save current domains before applying AC-3
-        # original_domains = {v: domain.copy() for v, domain in self.domains.items()}
+        # # Record the domain of var before reducing it, AC-3 records the domains it revises
+        # trail = [(var, self._domains[var])]
         
         # # Reduce domain of assigned variable to just this value
-        # self.domains[var] = {value}
+        # self._domains[var] = self._bit[value]
         
         # # Apply AC-3 to maintain arc consistency
-        # if self.ac_3():
-        #     # AC-3 succeeded, calculate what was removed
-        #     removed_values = {}
-        #     for variable in self.domains:
-        #         original = original_domains[variable]
-        #         current = self.domains[variable]
-        #         removed = original - current
-        #         if removed:
-        #             removed_values[variable] = removed
-        #     return removed_values
+        # if self.ac_3(trail):
+        #     return trail
         # else:
         #     # AC-3 failed (domain became empty), restore domains
-        #     self.domains = original_domains
+        #     self._restore_inferences(trail)
         #     return None
         
-        # # OPTION 2: No inference (naive backtracking)
-        return {}
+        # # OPTION 2: Forward checking
+        # # Record the domain of var before reducing it, and of every neighbor that loses a value
+        # domains = self._domains
+        # bit = self._bit[value]
+        # trail = [(var, domains[var])]
+        
+        # # Reduce domain of assigned variable to just this value
+        # domains[var] = bit
+        
+        # # Remove the value from the domains of the unassigned neighbors of var
+        # for neighbor in self.neighbors[var]:
+        #     domain = domains[neighbor]
+        #     if not domain & bit or neighbor in assignment:
+        #         continue
+        #     trail.append((neighbor, domain))
+        #     domains[neighbor] = domain & ~bit
+        #     if domain == bit:
+        #         # Domain became empty, restore domains
+        #         self._restore_inferences(trail)
+        #         return None
+        # return trail
+        
+        # # OPTION 3: No inference (naive backtracking)
+        return []
     
-    def _restore_inferences(self, inferences: dict[str, set]) -> None:
-        """Restore domain values that were removed during AC-3 inference.
+    def _restore_inferences(self, inferences: list[tuple[int, int]]) -> None:
+        """Restore domain values that were removed during inference.
         
         Parameters
         ----------
-        inferences : dict[str, set]
-            Dictionary mapping variables to sets of values that were removed
+        inferences : list[tuple[int, int]]
+            Trail of (variable, previous domain) entries, undone in reverse order
         """
-        for variable, removed_values in inferences.items():
-            self.domains[variable].update(removed_values)
+        for variable, previous_domain in reversed(inferences):
+            self._domains[variable] = previous_domain
 
-    def _is_consistent(self, var: str, value: Any, assignment: dict[str, Any]) -> bool:
+    def _is_consistent(self, var: int, value: Any, assignment: dict[int, Any]) -> bool:
         """Check if assigning value to var is consistent with current assignment.
         
         Parameters
         ----------
-        var : str
-            Variable to assign
+        var : int
+            Index of the variable to assign
         value : Any
             Value to assign to variable
-        assignment : dict[str, Any]
+        assignment : dict[int, Any]
             Current partial assignment
             
         Returns
@@ -246,19 +303,81 @@ class CSP:
         bool
             True if assignment is consistent
         """
+        # The row of var in the adjacency matrix is the same for every assigned variable
+        has_constraint = self.has_constraint
+        row = var * len(self.variables)
         for assigned_var, assigned_value in assignment.items():
             # Check binary constraints
-            if (var, assigned_var) in self.binary_constraints:
-                if (value, assigned_value) not in self.binary_constraints[(var, assigned_var)]:
-                    return False
-            elif (assigned_var, var) in self.binary_constraints:
-                if (assigned_value, value) not in self.binary_constraints[(assigned_var, var)]:
-                    return False
+            if value == assigned_value and has_constraint[row + assigned_var]:
+                return False
         return True
     
 
 
 
+def _ac3_core(
+    domains: list[int],
+    neighbors: list[tuple[int, ...]],
+    queue: deque,
+    in_queue: bytearray,
+    trail: list[tuple[int, int]] | None,
+) -> bool:
+    """The AC-3 worklist loop, revising the bitmask domains in place.
+
+    Only works on ints and plain containers passed in as arguments, with the revision of an arc
+    inlined, so that the loop makes no self attribute lookups and no _revise calls per arc.
+
+    Parameters
+    ----------
+    domains : list[int]
+        The bitmask domain of each variable
+    neighbors : list[tuple[int, ...]]
+        The neighbors of each variable
+    queue : deque
+        The arcs (xi, xj) to revise, encoded as xi * n + xj for n variables
+    in_queue : bytearray
+        Flags for the encoded arcs, set for exactly the arcs that are in the queue
+    trail : list[tuple[int, int]] | None
+        If given, a (variable, previous domain) entry is appended for every domain that is revised
+
+    Returns
+    -------
+    bool
+        False if a domain becomes empty, otherwise True
+    """
+    n = len(domains)
+
+    while queue:
+        arc = queue.popleft()
+        in_queue[arc] = 0
+        xi = arc // n
+        xj = arc - xi * n
+
+        # Revise the domain of xi to make it arc-consistent with xj
+        domain_j = domains[xj]
+        # A value of xi is only unsupported if xj has no other value left
+        if domain_j & (domain_j - 1):
+            continue
+        domain_i = domains[xi]
+        if domain_j and not domain_i & domain_j:
+            continue
+
+        # Remove inconsistent values, all at once: the value of xj, or every value if xj has none
+        if trail is not None:
+            trail.append((xi, domain_i))
+        domain_i = domain_i & ~domain_j if domain_j else 0
+        domains[xi] = domain_i
+        if domain_i == 0:
+            return False
+        # Add all arcs (xk, xi) where xk is a neighbor of xi (except xj)
+        for xk in neighbors[xi]:
+            arc = xk * n + xi
+            if xk != xj and not in_queue[arc]:
+                in_queue[arc] = 1
+                queue.append(arc)
+    return True
+
+
 def alldiff(variables: list[str]) -> list[tuple[str, str]]:
     """Returns a list of edges interconnecting all of the input variables
     
@@ -272,4 +391,4 @@ def alldiff(variables: list[str]) -> list[tuple[str, str]]:
     list[tuple[str, str]]
         List of edges in the form (a, b)
     """
-    return [(variables[i], variables[j]) for i in range(len(variables) - 1) for j in range(i + 1, len(variables))]
+    return list(combinations(variables, 2))
@@ -88,9 +88,10 @@ def test_ac3_on_puzzles():
             # Show some specific examples of domain reduction
             print(f"\nExamples of domain reduction:")
             count = 0
+            final_domains = csp.domains
             for var in sorted(csp.variables):
-                if len(original_domains[var]) > 1 and len(csp.domains[var]) < len(original_domains[var]):
-                    print(f"  {var}: {sorted(original_domains[var])} → {sorted(csp.domains[var])}")
+                if len(original_domains[var]) > 1 and len(final_domains[var]) < len(original_domains[var]):
+                    print(f"  {var}: {sorted(original_domains[var])} → {sorted(final_domains[var])}")
                     count += 1
                     if count >= 10:  # Show only first 10 examples
                         break
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Regression checks for the CSP solver on the four Sudoku puzzles and the map coloring problem.
+Checks that AC-3 prunes soundly and as much as expected, and that backtracking finds valid solutions.
+"""
+
+import os
+
+from csp import CSP
+from test_ac3 import create_sudoku_csp
+
+PUZZLE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Total number of values left in all domains after running AC-3 on each puzzle
+EXPECTED_VALUES_AFTER_AC3 = {
+    'sudoku_easy.txt': 81,
+    'sudoku_medium.txt': 118,
+    'sudoku_hard.txt': 197,
+    'sudoku_very_hard.txt': 223,
+}
+
+
+def read_grid(puzzle):
+    """Read a puzzle as a list of rows of digits, 0 being an empty cell."""
+    return open(os.path.join(PUZZLE_DIR, puzzle)).read().split()
+
+
+def sudoku_units():
+    """Return the rows, columns and boxes of a Sudoku board as lists of variables."""
+    units = [[f'X{row+1}{col+1}' for col in range(9)] for row in range(9)]
+    units += [[f'X{row+1}{col+1}' for row in range(9)] for col in range(9)]
+    units += [
+        [f'X{row+1}{col+1}' for row in range(box_row * 3, box_row * 3 + 3) for col in range(box_col * 3, box_col * 3 + 3)]
+        for box_row in range(3)
+        for box_col in range(3)
+    ]
+    return units
+
+
+def test_ac3_on_puzzles():
+    """AC-3 only removes values, keeps the given cells and prunes as much as expected."""
+    for puzzle, expected_values in EXPECTED_VALUES_AFTER_AC3.items():
+        csp = create_sudoku_csp(os.path.join(PUZZLE_DIR, puzzle))
+        original_domains = csp.domains
+
+        assert csp.ac_3(), puzzle
+        domains = csp.domains
+
+        for var in csp.variables:
+            assert domains[var] <= original_domains[var], (puzzle, var)
+            if len(original_domains[var]) == 1:
+                assert domains[var] == original_domains[var], (puzzle, var)
+        assert sum(len(domain) for domain in domains.values()) == expected_values, puzzle
+
+
+def test_backtracking_on_puzzles():
+    """Backtracking search returns a valid solution that keeps the given cells."""
+    for puzzle in EXPECTED_VALUES_AFTER_AC3:
+        grid = read_grid(puzzle)
+        csp = create_sudoku_csp(os.path.join(PUZZLE_DIR, puzzle))
+        solution = csp.backtracking_search()
+
+        assert solution is not None, puzzle
+        assert list(solution) == csp.variables, puzzle
+        for row in range(9):
+            for col in range(9):
+                if grid[row][col] != '0':
+                    assert solution[f'X{row+1}{col+1}'] == int(grid[row][col]), puzzle
+        for unit in sudoku_units():
+            assert sorted(solution[var] for var in unit) == list(range(1, 10)), (puzzle, unit)
+
+
+def test_map_coloring():
+    """Backtracking search colors the map from the text book with no adjacent regions alike."""
+    variables = ['WA', 'NT', 'Q', 'NSW', 'V', 'SA', 'T']
+    edges = [
+        ('SA', 'WA'),
+        ('SA', 'NT'),
+        ('SA', 'Q'),
+        ('SA', 'NSW'),
+        ('SA', 'V'),
+        ('WA', 'NT'),
+        ('NT', 'Q'),
+        ('Q', 'NSW'),
+        ('NSW', 'V'),
+    ]
+    csp = CSP(
+        variables=variables,
+        domains={variable: {'red', 'green', 'blue'} for variable in variables},
+        edges=edges,
+    )
+    solution = csp.backtracking_search()
+
+    assert solution is not None
+    assert list(solution) == variables
+    for variable1, variable2 in edges:
+        assert solution[variable1] != solution[variable2], (variable1, variable2)
+
+
+def test_domains_are_read_only():
+    """The domains snapshot cannot be used to modify the CSP."""
+    csp = create_sudoku_csp(os.path.join(PUZZLE_DIR, 'sudoku_easy.txt'))
+    try:
+        csp.domains['X11'].discard(7)
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("domains should not be modifiable")
+    assert 7 in csp.domains['X11']
+
+
+if __name__ == "__main__":
+    for test in [test_ac3_on_puzzles, test_backtracking_on_puzzles, test_map_coloring, test_domains_are_read_only]:
+        test()
+        print(f"{test.__name__}: OK")